@@ -2,16 +2,17 @@
 
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, timedelta
 from io import BytesIO
 
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
-from sqlalchemy import func
-from sqlalchemy.orm import aliased
+from sqlalchemy import and_, case, func, literal, or_, select, update
+from sqlalchemy.orm import aliased, sessionmaker
 
 from db_config import (
-    SessionLocal,
+    SessionLocal as _SessionLocal,
     TblAsientos,
     TblDocumentos,
     TblMovimientosContables,
@@ -19,11 +20,23 @@ from db_config import (
     TblProveedores,
     init_db,
 )
-from logica_contable import procesar_documento_con_control_duplicado
-from procesador_xml import parsear_dte_xml
+from logica_contable import procesar_documentos_batch
+from procesador_xml import parsear_lote_dte
+
+# Tope de filas del libro diario en pantalla; el resumen por cuenta siempre cubre todo el rango.
+LIMITE_FILAS_LIBRO = 1000
 
 st.set_page_config(page_title="Contab-PY", page_icon="📊", layout="wide")
-init_db()
+
+
+@st.cache_resource
+def get_session_factory() -> sessionmaker:
+    """Inicializa la base una sola vez por proceso y comparte la fábrica de sesiones entre reruns."""
+    init_db()
+    return _SessionLocal
+
+
+SessionLocal = get_session_factory()
 
 # CSS simple para elevar la percepción de "frontend" sin agregar dependencias externas.
 st.markdown(
@@ -31,11 +44,6 @@ st.markdown(
     <style>
     .main-title {font-size: 2rem; font-weight: 700; margin-bottom: 0.2rem;}
     .subtitle {color: #5e6a7d; margin-bottom: 1rem;}
-    .card {
-        border: 1px solid #E6EAF2; border-radius: 12px; padding: 14px;
-        background: linear-gradient(180deg, #ffffff 0%, #f9fbff 100%);
-        margin-bottom: 0.8rem;
-    }
     .small-note {color:#667085; font-size: 0.85rem;}
     </style>
     """,
@@ -51,154 +59,40 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-with st.sidebar:
-    st.header("Panel de Control")
-    with SessionLocal() as session:
-        total_docs = session.query(func.count(TblDocumentos.id)).scalar() or 0
-        total_asientos = session.query(func.count(TblAsientos.id)).scalar() or 0
-        total_proveedores = session.query(func.count(TblProveedores.rut)).scalar() or 0
-    st.metric("Documentos cargados", f"{total_docs:,}")
-    st.metric("Asientos generados", f"{total_asientos:,}")
-    st.metric("Proveedores registrados", f"{total_proveedores:,}")
-    st.caption("Estos indicadores ayudan al usuario final a validar si la operación diaria se está registrando.")
-
-    st.divider()
-    st.subheader("Filtros globales")
-    fecha_desde = st.date_input("Fecha desde", value=date.today().replace(day=1))
-    fecha_hasta = st.date_input("Fecha hasta", value=date.today())
-
-    if fecha_desde > fecha_hasta:
-        st.error("La fecha desde no puede ser mayor a la fecha hasta.")
 
-    st.divider()
-    st.markdown("**Ayuda rápida**")
-    st.markdown(
-        """1) Sube XML en *Carga Inteligente*  
-2) Ajusta cuentas en *Maestro de Clasificación*  
-3) Revisa *Visor Contable* y descarga en *Reportes*"""
+@st.cache_data(ttl=30, show_spinner=False)
+def _sidebar_counts() -> tuple[int, int, int]:
+    """Conteos del panel lateral en un solo round trip; se cachean para no repetirlos en cada rerun."""
+    stmt = select(
+        select(func.count(TblDocumentos.id)).scalar_subquery(),
+        select(func.count(TblAsientos.id)).scalar_subquery(),
+        select(func.count(TblProveedores.rut)).scalar_subquery(),
     )
+    with SessionLocal() as session:
+        total_docs, total_asientos, total_proveedores = session.execute(stmt).one()
+    return total_docs or 0, total_asientos or 0, total_proveedores or 0
 
 
-tab1, tab2, tab3, tab4 = st.tabs([
-    "📥 Carga Inteligente",
-    "🗂️ Maestro de Clasificación",
-    "📘 Visor Contable",
-    "📤 Reportes",
-])
-
-with tab1:
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.subheader("Carga masiva de XML (DTE)")
-    st.caption("La interfaz valida duplicados y muestra trazabilidad por archivo para que el usuario confíe en el proceso.")
-
-    with st.form("form_carga_xml"):
-        archivos = st.file_uploader(
-            "Selecciona uno o varios XML de compras",
-            type=["xml"],
-            accept_multiple_files=True,
-        )
-        ejecutar = st.form_submit_button("Procesar documentos", type="primary")
-
-    if ejecutar:
-        if not archivos:
-            st.warning("Debes seleccionar al menos un archivo XML.")
-        else:
-            insertados = 0
-            duplicados = 0
-            errores = 0
-            log = []
-
-            progreso = st.progress(0, text="Iniciando procesamiento...")
-            total = len(archivos)
-
-            for i, archivo in enumerate(archivos, start=1):
-                try:
-                    documento = parsear_dte_xml(archivo.getvalue(), archivo.name)
-                    res = procesar_documento_con_control_duplicado(documento)
-                    if res["status"] == "ok":
-                        insertados += 1
-                        estado = "insertado"
-                    else:
-                        duplicados += 1
-                        estado = "duplicado"
-                    log.append({"archivo": archivo.name, "estado": estado, "detalle": res.get("motivo", "OK")})
-                except Exception as exc:
-                    errores += 1
-                    log.append({"archivo": archivo.name, "estado": "error", "detalle": str(exc)})
-
-                progreso.progress(i / total, text=f"Procesando {i}/{total}")
-
-            st.session_state.ultimo_log_carga = log
-            st.success(f"{insertados} insertados, {duplicados} duplicados ignorados, {errores} con error")
-
-    if st.session_state.ultimo_log_carga:
-        st.dataframe(pd.DataFrame(st.session_state.ultimo_log_carga), use_container_width=True, hide_index=True)
-
-    st.markdown("</div>", unsafe_allow_html=True)
-
-with tab2:
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.subheader("Asignación de cuenta contable por proveedor")
-    st.caption("Esta pantalla permite al usuario de finanzas reclasificar gastos sin tocar código.")
-
+@st.cache_data(ttl=300, show_spinner=False)
+def _plan_cuentas() -> dict[str, int]:
+    """Opciones "codigo - nombre" -> id_cuenta del plan de cuentas; el plan casi no cambia entre reruns."""
+    stmt = select(TblPlanCuentas.id_cuenta, TblPlanCuentas.codigo, TblPlanCuentas.nombre).order_by(
+        TblPlanCuentas.codigo
+    )
     with SessionLocal() as session:
-        proveedores = session.query(TblProveedores).all()
-        cuentas = session.query(TblPlanCuentas).order_by(TblPlanCuentas.codigo).all()
-
-    if not proveedores:
-        st.info("Aún no hay proveedores cargados. Primero sube XMLs en la pestaña de Carga Inteligente.")
-    else:
-        map_cuentas = {c.id_cuenta: f"{c.codigo} - {c.nombre}" for c in cuentas}
-        opciones = {f"{c.codigo} - {c.nombre}": c.id_cuenta for c in cuentas}
-
-        df_prov = pd.DataFrame(
-            [
-                {
-                    "rut": p.rut,
-                    "razon_social": p.razon_social,
-                    "nueva_cuenta": map_cuentas.get(p.cuenta_contable_default_id, "Sin asignar"),
-                }
-                for p in proveedores
-            ]
-        )
-
-        filtro = st.text_input("Buscar proveedor por RUT o razón social", "")
-        if filtro.strip():
-            mask = (
-                df_prov["rut"].str.contains(filtro, case=False, na=False)
-                | df_prov["razon_social"].str.contains(filtro, case=False, na=False)
-            )
-            df_prov = df_prov[mask]
-
-        edited = st.data_editor(
-            df_prov,
-            hide_index=True,
-            use_container_width=True,
-            column_config={
-                "nueva_cuenta": st.column_config.SelectboxColumn(
-                    "Cuenta contable",
-                    options=list(opciones.keys()),
-                    required=True,
-                )
-            },
-        )
+        rows = session.execute(stmt).all()
+    return {f"{r.codigo} - {r.nombre}": r.id_cuenta for r in rows}
 
-        if st.button("Guardar clasificación", type="primary"):
-            with SessionLocal.begin() as session:
-                for _, row in edited.iterrows():
-                    prov = session.get(TblProveedores, row["rut"])
-                    if prov:
-                        prov.cuenta_contable_default_id = opciones[row["nueva_cuenta"]]
-            st.success("Clasificación de proveedores actualizada.")
-    st.markdown("</div>", unsafe_allow_html=True)
 
-with tab3:
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.subheader("Libro Diario y KPIs")
+@st.cache_data(ttl=60, show_spinner=False)
+def _libro(desde: date, hasta: date) -> tuple[pd.DataFrame, pd.DataFrame, bool]:
+    """Libro diario (acotado), resumen por cuenta e indicador de recorte del rango.
 
+    Solo se reconsulta si cambia el rango o hay carga nueva.
+    """
     with SessionLocal() as session:
         Cta = aliased(TblPlanCuentas)
-        libro_query = (
+        libro_query_rows = (
             session.query(
                 TblAsientos.id.label("asiento_id"),
                 TblAsientos.fecha,
@@ -210,50 +104,55 @@ with tab3:
             )
             .join(TblMovimientosContables, TblMovimientosContables.id_asiento == TblAsientos.id)
             .join(Cta, Cta.id_cuenta == TblMovimientosContables.id_cuenta)
-            .filter(TblAsientos.fecha.between(fecha_desde, fecha_hasta))
+            .filter(TblAsientos.fecha.between(desde, hasta))
             .order_by(TblAsientos.fecha.desc(), TblAsientos.id.desc())
+            # Una fila de más indica si el rango tiene movimientos que no se muestran.
+            .limit(LIMITE_FILAS_LIBRO + 1)
         )
-        libro_df = pd.read_sql(libro_query.statement, session.bind)
-
-        kpi_iva = (
-            session.query(func.coalesce(func.sum(TblDocumentos.monto_iva), 0.0))
-            .filter(TblDocumentos.fecha_emision.between(fecha_desde, fecha_hasta))
-            .scalar()
-            or 0.0
-        )
-        kpi_gasto_mes = (
-            session.query(func.coalesce(func.sum(TblDocumentos.monto_neto), 0.0))
-            .filter(func.strftime("%Y-%m", TblDocumentos.fecha_emision) == func.strftime("%Y-%m", func.current_date()))
-            .scalar()
-            or 0.0
+        # Sin dtype explícito el backend Arrow infiere la fecha como texto.
+        libro_df = pd.read_sql(
+            libro_query_rows.statement,
+            session.bind,
+            dtype_backend="pyarrow",
+            dtype={"fecha": pd.ArrowDtype(pa.date32())},
         )
 
-    col1, col2 = st.columns(2)
-    col1.metric("IVA Crédito Fiscal Acumulado (filtro)", f"${kpi_iva:,.0f}")
-    col2.metric("Total Gastos del Mes", f"${kpi_gasto_mes:,.0f}")
-
-    if libro_df.empty:
-        st.info("No hay movimientos para el rango seleccionado.")
-    else:
-        st.dataframe(libro_df, use_container_width=True, hide_index=True)
-        resumen = (
-            libro_df.groupby("cuenta", as_index=False)[["debe", "haber"]].sum().sort_values("debe", ascending=False)
+        # El resumen por cuenta se agrega en SQLite sobre todo el rango, no sobre las filas mostradas.
+        total_debe_cuenta = func.sum(TblMovimientosContables.debe)
+        resumen_query = (
+            session.query(
+                Cta.nombre.label("cuenta"),
+                total_debe_cuenta.label("debe"),
+                func.sum(TblMovimientosContables.haber).label("haber"),
+            )
+            .join(TblMovimientosContables, TblMovimientosContables.id_cuenta == Cta.id_cuenta)
+            .join(TblAsientos, TblAsientos.id == TblMovimientosContables.id_asiento)
+            .filter(TblAsientos.fecha.between(desde, hasta))
+            .group_by(Cta.nombre)
+            .order_by(total_debe_cuenta.desc())
         )
-        st.bar_chart(resumen.set_index("cuenta")[["debe", "haber"]])
-    st.markdown("</div>", unsafe_allow_html=True)
+        resumen = pd.read_sql(resumen_query.statement, session.bind, dtype_backend="pyarrow")
+    truncado = len(libro_df) > LIMITE_FILAS_LIBRO
+    return libro_df.head(LIMITE_FILAS_LIBRO), resumen, truncado
 
-with tab4:
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.subheader("Balance de 8 Columnas (resumen por cuenta)")
 
+@st.cache_data(ttl=60, show_spinner=False)
+def _balance() -> pd.DataFrame:
+    """Balance de 8 columnas; se cachea para no reagregar todos los movimientos en cada interacción."""
     with SessionLocal() as session:
+        total_debe = func.coalesce(func.sum(TblMovimientosContables.debe), 0.0)
+        total_haber = func.coalesce(func.sum(TblMovimientosContables.haber), 0.0)
         bal_query = (
             session.query(
                 TblPlanCuentas.codigo,
                 TblPlanCuentas.nombre,
                 TblPlanCuentas.tipo,
-                func.coalesce(func.sum(TblMovimientosContables.debe), 0.0).label("debe"),
-                func.coalesce(func.sum(TblMovimientosContables.haber), 0.0).label("haber"),
+                total_debe.label("debe"),
+                total_haber.label("haber"),
+                case((total_debe > total_haber, total_debe - total_haber), else_=0.0).label("saldo_deudor"),
+                case((total_haber > total_debe, total_haber - total_debe), else_=0.0).label("saldo_acreedor"),
+                literal(0.0).label("inventario"),
+                literal(0.0).label("resultado"),
             )
             .join(
                 TblMovimientosContables,
@@ -263,28 +162,237 @@ with tab4:
             .group_by(TblPlanCuentas.codigo, TblPlanCuentas.nombre, TblPlanCuentas.tipo)
             .order_by(TblPlanCuentas.codigo)
         )
-        balance_df = pd.read_sql(bal_query.statement, session.bind)
+        balance_df = pd.read_sql(bal_query.statement, session.bind, dtype_backend="pyarrow")
+    return balance_df
 
-    balance_df["saldo_deudor"] = (balance_df["debe"] - balance_df["haber"]).clip(lower=0)
-    balance_df["saldo_acreedor"] = (balance_df["haber"] - balance_df["debe"]).clip(lower=0)
-    balance_df["inventario"] = 0.0
-    balance_df["resultado"] = 0.0
 
-    st.dataframe(balance_df, use_container_width=True, hide_index=True)
+@st.cache_resource
+def _claves_documentos() -> set[tuple[str, str, str]]:
+    """Claves (folio, rut, tipo) registradas; compartidas entre sesiones para descartar re-subidas."""
+    stmt = select(TblDocumentos.folio, TblDocumentos.rut_emisor, TblDocumentos.tipo_dte)
+    with SessionLocal() as session:
+        return {tuple(row) for row in session.execute(stmt)}
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        balance_df.to_excel(writer, sheet_name="Balance_8_Columnas", index=False)
-        # Hoja adicional útil en entrevista para demostrar trazabilidad de movimientos.
-        if st.session_state.ultimo_log_carga:
-            pd.DataFrame(st.session_state.ultimo_log_carga).to_excel(writer, sheet_name="Log_Carga", index=False)
-    output.seek(0)
-
-    st.download_button(
-        "Descargar Excel",
-        data=output,
-        file_name="balance_8_columnas.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+
+with st.sidebar:
+    st.header("Panel de Control")
+    total_docs, total_asientos, total_proveedores = _sidebar_counts()
+    st.metric("Documentos cargados", f"{total_docs:,}")
+    st.metric("Asientos generados", f"{total_asientos:,}")
+    st.metric("Proveedores registrados", f"{total_proveedores:,}")
+    st.caption("Estos indicadores ayudan al usuario final a validar si la operación diaria se está registrando.")
+
+    st.divider()
+    st.subheader("Filtros globales")
+    fecha_desde = st.date_input("Fecha desde", value=date.today().replace(day=1))
+    fecha_hasta = st.date_input("Fecha hasta", value=date.today())
+
+    if fecha_desde > fecha_hasta:
+        st.error("La fecha desde no puede ser mayor a la fecha hasta.")
+
+    st.divider()
+    st.markdown("**Ayuda rápida**")
+    st.markdown(
+        """1) Sube XML en *Carga Inteligente*  
+2) Ajusta cuentas en *Maestro de Clasificación*  
+3) Revisa *Visor Contable* y descarga en *Reportes*"""
     )
-    st.markdown("<span class='small-note'>Incluye resumen contable y, si existe, log de carga.</span>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
+
+
+tab1, tab2, tab3, tab4 = st.tabs([
+    "📥 Carga Inteligente",
+    "🗂️ Maestro de Clasificación",
+    "📘 Visor Contable",
+    "📤 Reportes",
+])
+
+with tab1:
+    with st.container(border=True):
+        st.subheader("Carga masiva de XML (DTE)")
+        st.caption("La interfaz valida duplicados y muestra trazabilidad por archivo para que el usuario confíe en el proceso.")
+
+        with st.form("form_carga_xml"):
+            archivos = st.file_uploader(
+                "Selecciona uno o varios XML de compras",
+                type=["xml"],
+                accept_multiple_files=True,
+            )
+            ejecutar = st.form_submit_button("Procesar documentos", type="primary")
+
+        if ejecutar:
+            if not archivos:
+                st.warning("Debes seleccionar al menos un archivo XML.")
+            else:
+                insertados = 0
+                duplicados = 0
+                errores = 0
+                log = []
+
+                progreso = st.progress(0, text="Iniciando procesamiento...")
+                total = len(archivos)
+
+                documentos = []
+                nombres = []
+                entradas = [(archivo, archivo.name) for archivo in archivos]
+                for i, ((_, nombre), parseado) in enumerate(zip(entradas, parsear_lote_dte(entradas)), start=1):
+                    if "error" in parseado:
+                        errores += 1
+                        log.append({"archivo": nombre, "estado": "error", "detalle": parseado["error"]})
+                    else:
+                        documentos.append(parseado)
+                        nombres.append(nombre)
+
+                    progreso.progress(i / total, text=f"Leyendo {i}/{total}")
+
+                if documentos:
+                    progreso.progress(1.0, text=f"Registrando {len(documentos)} documentos...")
+                    try:
+                        resultados = procesar_documentos_batch(documentos, claves_conocidas=_claves_documentos())
+                    except Exception as exc:
+                        errores += len(nombres)
+                        log.extend({"archivo": nombre, "estado": "error", "detalle": str(exc)} for nombre in nombres)
+                    else:
+                        for nombre, res in zip(nombres, resultados):
+                            if res["status"] == "ok":
+                                insertados += 1
+                                estado = "insertado"
+                            else:
+                                duplicados += 1
+                                estado = "duplicado"
+                            log.append({"archivo": nombre, "estado": estado, "detalle": res.get("motivo", "OK")})
+
+                st.session_state.ultimo_log_carga = log
+                _sidebar_counts.clear()
+                _libro.clear()
+                _balance.clear()
+                st.success(f"{insertados} insertados, {duplicados} duplicados ignorados, {errores} con error")
+
+        if st.session_state.ultimo_log_carga:
+            # Una tabla Arrow va directo a st.dataframe; una lista de dicts pasaría igual por pandas.
+            log_carga = pa.Table.from_pylist(st.session_state.ultimo_log_carga)
+            st.dataframe(log_carga, use_container_width=True, hide_index=True)
+
+with tab2:
+    with st.container(border=True):
+        st.subheader("Asignación de cuenta contable por proveedor")
+        st.caption("Esta pantalla permite al usuario de finanzas reclasificar gastos sin tocar código.")
+
+        prov_query = select(
+            TblProveedores.rut,
+            TblProveedores.razon_social,
+            TblPlanCuentas.codigo.label("c_codigo"),
+            TblPlanCuentas.nombre.label("c_nombre"),
+        ).join(
+            TblPlanCuentas,
+            TblProveedores.cuenta_contable_default_id == TblPlanCuentas.id_cuenta,
+            isouter=True,
+        )
+        with SessionLocal() as session:
+            df_prov = pd.read_sql(prov_query, session.bind, dtype_backend="pyarrow")
+
+        if df_prov.empty:
+            st.info("Aún no hay proveedores cargados. Primero sube XMLs en la pestaña de Carga Inteligente.")
+        else:
+            opciones = _plan_cuentas()
+
+            # La etiqueta "codigo - nombre" se arma vectorizada sobre el JOIN, sin recorrer proveedores en Python.
+            df_prov["nueva_cuenta"] = (df_prov["c_codigo"] + " - " + df_prov["c_nombre"]).where(
+                df_prov["c_codigo"].notna(), "Sin asignar"
+            )
+            df_prov = df_prov.drop(columns=["c_codigo", "c_nombre"])
+
+            filtro = st.text_input("Buscar proveedor por RUT o razón social", "")
+            if filtro.strip():
+                # Una sola búsqueda literal (kernel Arrow) sobre ambas columnas;
+                # el separador evita coincidencias que crucen de un campo a otro.
+                buscable = df_prov["rut"] + "\x1f" + df_prov["razon_social"]
+                mask = buscable.str.contains(filtro.strip(), case=False, regex=False).fillna(False)
+                df_prov = df_prov[mask]
+
+            edited = st.data_editor(
+                df_prov,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "nueva_cuenta": st.column_config.SelectboxColumn(
+                        "Cuenta contable",
+                        options=list(opciones.keys()),
+                        required=True,
+                    )
+                },
+            )
+
+            if st.button("Guardar clasificación", type="primary"):
+                # Solo se escriben las filas que el usuario cambió, en un único UPDATE masivo por PK.
+                cambios = edited[edited["nueva_cuenta"] != df_prov["nueva_cuenta"]]
+                payload = [
+                    {"rut": rut, "cuenta_contable_default_id": opciones[cuenta]}
+                    for rut, cuenta in zip(cambios["rut"], cambios["nueva_cuenta"])
+                    if cuenta in opciones
+                ]
+                if payload:
+                    with SessionLocal.begin() as session:
+                        session.execute(update(TblProveedores), payload)
+                st.success("Clasificación de proveedores actualizada.")
+
+with tab3:
+    with st.container(border=True):
+        st.subheader("Libro Diario y KPIs")
+
+        libro_df, resumen, libro_truncado = _libro(fecha_desde, fecha_hasta)
+
+        with SessionLocal() as session:
+            # Rango semiabierto del mes en curso: a diferencia de strftime por fila, permite usar el índice.
+            inicio_mes = date.today().replace(day=1)
+            inicio_mes_siguiente = (inicio_mes + timedelta(days=32)).replace(day=1)
+            en_filtro = TblDocumentos.fecha_emision.between(fecha_desde, fecha_hasta)
+            en_mes = and_(
+                TblDocumentos.fecha_emision >= inicio_mes,
+                TblDocumentos.fecha_emision < inicio_mes_siguiente,
+            )
+            kpi_iva, kpi_gasto_mes = session.execute(
+                select(
+                    func.coalesce(func.sum(case((en_filtro, TblDocumentos.monto_iva), else_=0.0)), 0.0),
+                    func.coalesce(func.sum(case((en_mes, TblDocumentos.monto_neto), else_=0.0)), 0.0),
+                ).where(or_(en_filtro, en_mes))
+            ).one()
+
+        col1, col2 = st.columns(2)
+        col1.metric("IVA Crédito Fiscal Acumulado (filtro)", f"${kpi_iva:,.0f}")
+        col2.metric("Total Gastos del Mes", f"${kpi_gasto_mes:,.0f}")
+
+        if libro_df.empty:
+            st.info("No hay movimientos para el rango seleccionado.")
+        else:
+            st.dataframe(libro_df, use_container_width=True, hide_index=True)
+            if libro_truncado:
+                st.caption(
+                    f"Se muestran los {LIMITE_FILAS_LIBRO:,} movimientos más recientes; acota el rango para ver el resto."
+                )
+            st.bar_chart(resumen.set_index("cuenta")[["debe", "haber"]])
+
+with tab4:
+    with st.container(border=True):
+        st.subheader("Balance de 8 Columnas (resumen por cuenta)")
+
+        balance_df = _balance()
+
+        st.dataframe(balance_df, use_container_width=True, hide_index=True)
+
+        output = BytesIO()
+        # xlsxwriter es más rápido que openpyxl para libros de solo escritura. No usar constant_memory:
+        # to_excel escribe por columnas y ese modo descarta las celdas de filas ya volcadas.
+        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+            balance_df.to_excel(writer, sheet_name="Balance_8_Columnas", index=False)
+            # Hoja adicional útil en entrevista para demostrar trazabilidad de movimientos.
+            if st.session_state.ultimo_log_carga:
+                pd.DataFrame(st.session_state.ultimo_log_carga).to_excel(writer, sheet_name="Log_Carga", index=False)
+        output.seek(0)
+
+        st.download_button(
+            "Descargar Excel",
+            data=output,
+            file_name="balance_8_columnas.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        st.markdown("<span class='small-note'>Incluye resumen contable y, si existe, log de carga.</span>", unsafe_allow_html=True)
@@ -14,6 +14,8 @@ from sqlalchemy import (
     String,
     UniqueConstraint,
     create_engine,
+    event,
+    insert,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker
 
@@ -56,7 +58,7 @@ class TblDocumentos(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     folio: Mapped[str] = mapped_column(String(30), nullable=False)
     tipo_dte: Mapped[str] = mapped_column(String(10), nullable=False)
-    fecha_emision: Mapped[Date] = mapped_column(Date, nullable=False)
+    fecha_emision: Mapped[Date] = mapped_column(Date, nullable=False, index=True)
     rut_emisor: Mapped[str] = mapped_column(String(20), nullable=False, index=True)
     monto_neto: Mapped[float] = mapped_column(Float, nullable=False)
     monto_iva: Mapped[float] = mapped_column(Float, nullable=False)
@@ -69,31 +71,46 @@ class TblAsientos(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     id_documento: Mapped[int] = mapped_column(ForeignKey("Tbl_Documentos.id"), nullable=False)
-    fecha: Mapped[Date] = mapped_column(Date, nullable=False)
+    fecha: Mapped[Date] = mapped_column(Date, nullable=False, index=True)
 
 
 class TblMovimientosContables(Base):
     __tablename__ = "Tbl_Movimientos_Contables"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    id_asiento: Mapped[int] = mapped_column(ForeignKey("Tbl_Asientos.id"), nullable=False)
-    id_cuenta: Mapped[int] = mapped_column(ForeignKey("Tbl_PlanCuentas.id_cuenta"), nullable=False)
+    id_asiento: Mapped[int] = mapped_column(ForeignKey("Tbl_Asientos.id"), nullable=False, index=True)
+    id_cuenta: Mapped[int] = mapped_column(
+        ForeignKey("Tbl_PlanCuentas.id_cuenta"), nullable=False, index=True
+    )
     debe: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     haber: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     glosa: Mapped[str] = mapped_column(String(255), nullable=False)
 
 
-engine = create_engine(f"sqlite:///{DB_PATH}", future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+engine = create_engine(
+    f"sqlite:///{DB_PATH}",
+    future=True,
+    # Caché LRU de SQL compilado: las consultas repetidas de cada rerun de Streamlit no se recompilan.
+    query_cache_size=1200,
+    # Streamlit ejecuta el script en hilos distintos entre reruns.
+    connect_args={"check_same_thread": False},
+)
 
 
-def _upsert_cuenta(codigo: str, nombre: str, tipo: str) -> None:
-    """Inserta cuentas base si no existen para dejar la app lista para usar."""
-    with SessionLocal() as session:
-        exists = session.query(TblPlanCuentas).filter(TblPlanCuentas.codigo == codigo).first()
-        if not exists:
-            session.add(TblPlanCuentas(codigo=codigo, nombre=nombre, tipo=tipo))
-            session.commit()
+@event.listens_for(engine, "connect")
+def _configurar_sqlite(dbapi_connection, _connection_record) -> None:
+    """WAL + synchronous=NORMAL reduce los fsync por commit sin perder durabilidad ante caídas de la app.
+
+    temp_store=MEMORY deja en RAM los temporales de ORDER BY / GROUP BY del libro y el balance.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 
 def seed_plan_cuentas() -> None:
@@ -102,14 +119,23 @@ def seed_plan_cuentas() -> None:
         return
 
     with PLAN_CUENTAS_CSV.open("r", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            _upsert_cuenta(row["codigo"], row["nombre"], row["tipo"])
+        rows = [{"codigo": r["codigo"], "nombre": r["nombre"], "tipo": r["tipo"]} for r in csv.DictReader(file)]
+    if not rows:
+        return
+
+    # Un solo INSERT masivo; OR IGNORE deja intactas las cuentas cuyo código ya existe.
+    with SessionLocal.begin() as session:
+        session.execute(insert(TblPlanCuentas.__table__).prefix_with("OR IGNORE", dialect="sqlite"), rows)
 
 
 def init_db() -> None:
     """Crea tablas y datos mínimos al inicio de la app."""
     Base.metadata.create_all(engine)
+    # create_all no agrega índices nuevos a tablas que ya existían en bases creadas antes.
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
     seed_plan_cuentas()
 
 
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import functools
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from sqlalchemy import insert, select, tuple_
 from sqlalchemy.exc import IntegrityError
 
 from db_config import (
@@ -16,11 +18,74 @@ from db_config import (
 )
 
 
-def _obtener_cuenta_por_nombre(session, nombre: str) -> TblPlanCuentas:
-    cuenta = session.query(TblPlanCuentas).filter(TblPlanCuentas.nombre == nombre).first()
-    if not cuenta:
-        raise ValueError(f"No existe la cuenta obligatoria: {nombre}")
-    return cuenta
+CUENTA_GASTOS_DEFAULT = "Gastos Generales (Por Clasificar)"
+CUENTA_IVA = "IVA Crédito Fiscal"
+CUENTA_PROVEEDORES = "Proveedores por Pagar"
+CUENTAS_OBLIGATORIAS = (CUENTA_GASTOS_DEFAULT, CUENTA_IVA, CUENTA_PROVEEDORES)
+
+COLUMNAS_DOCUMENTO = tuple(c.key for c in TblDocumentos.__table__.columns if c.key != "id")
+
+MOTIVO_DUPLICADO = "Documento ya existe (folio, rut, tipo_dte)"
+
+
+@functools.lru_cache(maxsize=1)
+def _ids_cuentas_obligatorias() -> Tuple[int, int, int]:
+    """IDs de (gastos por clasificar, IVA crédito, proveedores por pagar), resueltos una vez por proceso.
+
+    Estas cuentas no cambian después de ``seed_plan_cuentas``; si falta alguna no se cachea el error
+    y se vuelve a consultar en el siguiente intento.
+    """
+    with SessionLocal() as session:
+        ids = dict(
+            session.execute(
+                select(TblPlanCuentas.nombre, TblPlanCuentas.id_cuenta).where(
+                    TblPlanCuentas.nombre.in_(CUENTAS_OBLIGATORIAS)
+                )
+            ).all()
+        )
+    faltantes = [nombre for nombre in CUENTAS_OBLIGATORIAS if nombre not in ids]
+    if faltantes:
+        raise ValueError(f"No existe la cuenta obligatoria: {', '.join(faltantes)}")
+    return ids[CUENTA_GASTOS_DEFAULT], ids[CUENTA_IVA], ids[CUENTA_PROVEEDORES]
+
+
+def _clave_documento(documento: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (documento["folio"], documento["rut_emisor"], documento["tipo_dte"])
+
+
+def _movimientos_compra(
+    documento: Dict[str, Any],
+    id_asiento: int,
+    razon_social: str,
+    id_cuenta_gasto: int,
+    id_cuenta_iva: int,
+    id_cuenta_proveedores: int,
+) -> List[Dict[str, Any]]:
+    """Arma los tres movimientos de partida doble de una compra."""
+    glosa_base = f"Compra DTE {documento['tipo_dte']} Folio {documento['folio']} - {razon_social}"
+    return [
+        {
+            "id_asiento": id_asiento,
+            "id_cuenta": id_cuenta_gasto,
+            "debe": documento["monto_neto"],
+            "haber": 0.0,
+            "glosa": f"{glosa_base} | Gasto Neto",
+        },
+        {
+            "id_asiento": id_asiento,
+            "id_cuenta": id_cuenta_iva,
+            "debe": documento["monto_iva"],
+            "haber": 0.0,
+            "glosa": f"{glosa_base} | IVA Crédito Fiscal",
+        },
+        {
+            "id_asiento": id_asiento,
+            "id_cuenta": id_cuenta_proveedores,
+            "debe": 0.0,
+            "haber": documento["monto_total"],
+            "glosa": f"{glosa_base} | Proveedores por Pagar",
+        },
+    ]
 
 
 def generar_asiento(documento: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,25 +99,23 @@ def generar_asiento(documento: Dict[str, Any]) -> Dict[str, Any]:
     La operación se ejecuta en una sola transacción para garantizar atomicidad:
     o se escriben documento/asiento/movimientos completos o no se escribe nada.
     """
+    id_gastos_default, id_iva, id_proveedores = _ids_cuentas_obligatorias()
+
     with SessionLocal.begin() as session:
         proveedor = session.get(TblProveedores, documento["rut_emisor"])
 
-        cuenta_gastos_default = _obtener_cuenta_por_nombre(session, "Gastos Generales (Por Clasificar)")
-        cuenta_iva = _obtener_cuenta_por_nombre(session, "IVA Crédito Fiscal")
-        cuenta_proveedores = _obtener_cuenta_por_nombre(session, "Proveedores por Pagar")
-
         if proveedor is None:
             proveedor = TblProveedores(
                 rut=documento["rut_emisor"],
                 razon_social=documento.get("razon_social", "Proveedor sin nombre"),
-                cuenta_contable_default_id=cuenta_gastos_default.id_cuenta,
+                cuenta_contable_default_id=id_gastos_default,
             )
             session.add(proveedor)
             session.flush()
 
-        id_cuenta_gasto = proveedor.cuenta_contable_default_id or cuenta_gastos_default.id_cuenta
+        id_cuenta_gasto = proveedor.cuenta_contable_default_id or id_gastos_default
 
-        doc_db = TblDocumentos(**documento)
+        doc_db = TblDocumentos(**{k: documento[k] for k in COLUMNAS_DOCUMENTO})
         session.add(doc_db)
         session.flush()
 
@@ -60,31 +123,15 @@ def generar_asiento(documento: Dict[str, Any]) -> Dict[str, Any]:
         session.add(asiento)
         session.flush()
 
-        glosa_base = f"Compra DTE {documento['tipo_dte']} Folio {documento['folio']} - {proveedor.razon_social}"
-        movimientos = [
-            TblMovimientosContables(
-                id_asiento=asiento.id,
-                id_cuenta=id_cuenta_gasto,
-                debe=documento["monto_neto"],
-                haber=0.0,
-                glosa=f"{glosa_base} | Gasto Neto",
-            ),
-            TblMovimientosContables(
-                id_asiento=asiento.id,
-                id_cuenta=cuenta_iva.id_cuenta,
-                debe=documento["monto_iva"],
-                haber=0.0,
-                glosa=f"{glosa_base} | IVA Crédito Fiscal",
-            ),
-            TblMovimientosContables(
-                id_asiento=asiento.id,
-                id_cuenta=cuenta_proveedores.id_cuenta,
-                debe=0.0,
-                haber=documento["monto_total"],
-                glosa=f"{glosa_base} | Proveedores por Pagar",
-            ),
-        ]
-        session.add_all(movimientos)
+        movimientos = _movimientos_compra(
+            documento,
+            asiento.id,
+            proveedor.razon_social,
+            id_cuenta_gasto,
+            id_iva,
+            id_proveedores,
+        )
+        session.add_all(TblMovimientosContables(**m) for m in movimientos)
 
         return {"status": "ok", "documento_id": doc_db.id, "asiento_id": asiento.id}
 
@@ -94,4 +141,134 @@ def procesar_documento_con_control_duplicado(documento: Dict[str, Any]) -> Dict[
     try:
         return generar_asiento(documento)
     except IntegrityError:
-        return {"status": "duplicado", "motivo": "Documento ya existe (folio, rut, tipo_dte)"}
+        return {"status": "duplicado", "motivo": MOTIVO_DUPLICADO}
+
+
+def procesar_documentos_batch(
+    documentos: List[Dict[str, Any]],
+    claves_conocidas: Optional[Set[Tuple[str, str, str]]] = None,
+) -> List[Dict[str, Any]]:
+    """Procesa una carga masiva de documentos en una sola transacción.
+
+    Devuelve un resultado por documento, en el mismo orden de entrada y con la misma forma que
+    ``procesar_documento_con_control_duplicado``. Proveedores y duplicados se resuelven con una
+    consulta cada uno y las escrituras van como inserts masivos, de modo que el costo deja de
+    crecer en transacciones por archivo. Si otra carga concurrente provoca un
+    ``IntegrityError``, se reintenta documento a documento para conservar el control de duplicados.
+
+    ``claves_conocidas`` es un set opcional de ``(folio, rut_emisor, tipo_dte)`` ya registrados:
+    los documentos que están ahí se marcan duplicados sin tocar la base, y tras la carga se agregan
+    las claves procesadas. El resto sigue validándose contra la base, así que un set desactualizado
+    solo reduce el atajo, no la corrección.
+    """
+    resultados: List[Dict[str, Any]] = [{"status": "duplicado", "motivo": MOTIVO_DUPLICADO} for _ in documentos]
+    if claves_conocidas is None:
+        claves_conocidas = set()
+
+    pendientes = [i for i, documento in enumerate(documentos) if _clave_documento(documento) not in claves_conocidas]
+    if not pendientes:
+        return resultados
+
+    lote = [documentos[i] for i in pendientes]
+    try:
+        resultados_lote = _insertar_documentos_batch(lote)
+    except IntegrityError:
+        resultados_lote = [procesar_documento_con_control_duplicado(documento) for documento in lote]
+
+    for i, resultado in zip(pendientes, resultados_lote):
+        resultados[i] = resultado
+    # Tras la carga todas las claves del lote existen en la base, insertadas ahora o antes.
+    claves_conocidas.update(_clave_documento(documento) for documento in lote)
+    return resultados
+
+
+def _insertar_documentos_batch(documentos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    resultados: List[Dict[str, Any]] = [{"status": "duplicado", "motivo": MOTIVO_DUPLICADO} for _ in documentos]
+
+    id_gastos_default, id_iva, id_proveedores = _ids_cuentas_obligatorias()
+
+    with SessionLocal.begin() as session:
+        claves = {_clave_documento(d) for d in documentos}
+        existentes = set(
+            session.execute(
+                select(TblDocumentos.folio, TblDocumentos.rut_emisor, TblDocumentos.tipo_dte).where(
+                    tuple_(TblDocumentos.folio, TblDocumentos.rut_emisor, TblDocumentos.tipo_dte).in_(claves)
+                )
+            ).tuples()
+        )
+
+        # Índices de los documentos a insertar; también descarta duplicados dentro de la misma carga.
+        a_insertar: List[int] = []
+        for i, documento in enumerate(documentos):
+            clave = _clave_documento(documento)
+            if clave not in existentes:
+                existentes.add(clave)
+                a_insertar.append(i)
+
+        if not a_insertar:
+            return resultados
+
+        ruts = {documentos[i]["rut_emisor"] for i in a_insertar}
+        proveedores = {
+            rut: (razon_social, cuenta_id)
+            for rut, razon_social, cuenta_id in session.execute(
+                select(
+                    TblProveedores.rut,
+                    TblProveedores.razon_social,
+                    TblProveedores.cuenta_contable_default_id,
+                ).where(TblProveedores.rut.in_(ruts))
+            ).tuples()
+        }
+
+        nuevos_proveedores = []
+        for i in a_insertar:
+            documento = documentos[i]
+            if documento["rut_emisor"] not in proveedores:
+                razon_social = documento.get("razon_social", "Proveedor sin nombre")
+                proveedores[documento["rut_emisor"]] = (razon_social, id_gastos_default)
+                nuevos_proveedores.append(
+                    {
+                        "rut": documento["rut_emisor"],
+                        "razon_social": razon_social,
+                        "cuenta_contable_default_id": id_gastos_default,
+                    }
+                )
+        if nuevos_proveedores:
+            session.execute(
+                insert(TblProveedores.__table__).prefix_with("OR IGNORE", dialect="sqlite"),
+                nuevos_proveedores,
+            )
+
+        ids_documentos = session.scalars(
+            insert(TblDocumentos).returning(TblDocumentos.id, sort_by_parameter_order=True),
+            [{k: documentos[i][k] for k in COLUMNAS_DOCUMENTO} for i in a_insertar],
+        ).all()
+
+        ids_asientos = session.scalars(
+            insert(TblAsientos).returning(TblAsientos.id, sort_by_parameter_order=True),
+            [
+                {"id_documento": id_documento, "fecha": documentos[i]["fecha_emision"]}
+                for i, id_documento in zip(a_insertar, ids_documentos)
+            ],
+        ).all()
+
+        movimientos = []
+        for i, id_asiento in zip(a_insertar, ids_asientos):
+            documento = documentos[i]
+            razon_social, cuenta_id = proveedores[documento["rut_emisor"]]
+            movimientos.extend(
+                _movimientos_compra(
+                    documento,
+                    id_asiento,
+                    razon_social,
+                    cuenta_id or id_gastos_default,
+                    id_iva,
+                    id_proveedores,
+                )
+            )
+        session.execute(insert(TblMovimientosContables), movimientos)
+
+        for i, id_documento, id_asiento in zip(a_insertar, ids_documentos, ids_asientos):
+            resultados[i] = {"status": "ok", "documento_id": id_documento, "asiento_id": id_asiento}
+
+    return resultados
@@ -2,26 +2,27 @@
 
 from __future__ import annotations
 
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Any, Dict
-
-import xmltodict
-
-
-def _buscar_nodo_recursivo(data: Any, clave_objetivo: str) -> Any:
-    """Busca una clave anidada de forma robusta para soportar variaciones del XML DTE."""
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if key == clave_objetivo:
-                return value
-            found = _buscar_nodo_recursivo(value, clave_objetivo)
-            if found is not None:
-                return found
-    elif isinstance(data, list):
-        for item in data:
-            found = _buscar_nodo_recursivo(item, clave_objetivo)
-            if found is not None:
-                return found
+from io import BytesIO
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from lxml import etree
+
+# Bajo este número de archivos no compensa levantar el pool de procesos.
+MIN_ARCHIVOS_PARSEO_PARALELO = 16
+
+
+def _buscar_encabezado(fuente: BinaryIO) -> Optional[etree._Element]:
+    """Devuelve el primer nodo ``Encabezado`` sin importar el namespace ni si viene en DTE o EnvioDTE.
+
+    Se usa ``iterparse`` sobre el archivo para detener la lectura apenas aparece el nodo, sin cargar
+    el XML completo en memoria ni recorrer el árbol recursivamente.
+    """
+    contexto = etree.iterparse(fuente, events=("end",), tag="{*}Encabezado", resolve_entities=False)
+    for _, encabezado in contexto:
+        return encabezado
     return None
 
 
@@ -32,36 +33,71 @@ def _safe_float(value: Any) -> float:
         return 0.0
 
 
-def parsear_dte_xml(xml_bytes: bytes, nombre_archivo: str = "sin_nombre.xml") -> Dict[str, Any]:
-    """Parsea un XML DTE y devuelve un diccionario estándar de documento.
+def parsear_dte_xml(fileobj: BinaryIO, nombre_archivo: str = "sin_nombre.xml") -> Dict[str, Any]:
+    """Parsea un XML DTE desde un archivo binario (p. ej. ``UploadedFile``) y devuelve un diccionario
+    estándar de documento. El archivo se lee en streaming, sin copiar sus bytes a memoria.
 
     Se encapsula en try/except porque en escenarios reales llegan XML truncados o con namespaces
     no homogéneos; devolver un error manejado evita cortar toda la carga masiva.
     """
     try:
-        data = xmltodict.parse(xml_bytes)
-
-        encabezado = _buscar_nodo_recursivo(data, "Encabezado")
-        if not encabezado:
+        if fileobj.seekable():
+            fileobj.seek(0)
+        encabezado = _buscar_encabezado(fileobj)
+        if encabezado is None:
             raise ValueError("No se encontró nodo 'Encabezado' en el XML")
 
-        id_doc = encabezado.get("IdDoc", {})
-        emisor = encabezado.get("Emisor", {})
-        totales = encabezado.get("Totales", {})
-
-        fecha = id_doc.get("FchEmis")
+        fecha = encabezado.findtext("{*}IdDoc/{*}FchEmis")
         fecha_emision = datetime.strptime(fecha, "%Y-%m-%d").date()
 
         return {
-            "folio": str(id_doc.get("Folio", "")).strip(),
-            "tipo_dte": str(id_doc.get("TipoDTE", "")).strip(),
+            "folio": encabezado.findtext("{*}IdDoc/{*}Folio", "").strip(),
+            "tipo_dte": encabezado.findtext("{*}IdDoc/{*}TipoDTE", "").strip(),
             "fecha_emision": fecha_emision,
-            "rut_emisor": str(emisor.get("RUTEmisor", "")).strip(),
-            "razon_social": str(emisor.get("RznSoc", "Proveedor sin nombre")).strip(),
-            "monto_neto": _safe_float(totales.get("MntNeto")),
-            "monto_iva": _safe_float(totales.get("IVA")),
-            "monto_total": _safe_float(totales.get("MntTotal")),
+            "rut_emisor": encabezado.findtext("{*}Emisor/{*}RUTEmisor", "").strip(),
+            "razon_social": encabezado.findtext("{*}Emisor/{*}RznSoc", "Proveedor sin nombre").strip(),
+            "monto_neto": _safe_float(encabezado.findtext("{*}Totales/{*}MntNeto")),
+            "monto_iva": _safe_float(encabezado.findtext("{*}Totales/{*}IVA")),
+            "monto_total": _safe_float(encabezado.findtext("{*}Totales/{*}MntTotal")),
             "url_archivo": nombre_archivo,
         }
     except Exception as exc:
         raise ValueError(f"No se pudo procesar {nombre_archivo}: {exc}") from exc
+
+
+def _leer_bytes(archivo: BinaryIO) -> bytes:
+    if archivo.seekable():
+        archivo.seek(0)
+    return archivo.read()
+
+
+def parsear_dte_xml_worker(payload: Tuple[Union[bytes, BinaryIO], str]) -> Dict[str, Any]:
+    """Variante para ``ProcessPoolExecutor``: nunca lanza, devuelve ``{"error": ...}`` si el XML falla.
+
+    Vive a nivel de módulo para que sea serializable entre procesos; el error viaja como dato para
+    que un archivo malo no cancele el resto del ``map``. Acepta bytes porque es lo que cruza al
+    proceso hijo; ``BytesIO`` los envuelve sin copiarlos.
+    """
+    fuente, nombre_archivo = payload
+    if isinstance(fuente, bytes):
+        fuente = BytesIO(fuente)
+    try:
+        return parsear_dte_xml(fuente, nombre_archivo)
+    except ValueError as exc:
+        return {"error": str(exc)}
+
+
+def parsear_lote_dte(archivos: List[Tuple[BinaryIO, str]]) -> Iterator[Dict[str, Any]]:
+    """Parsea ``(archivo, nombre_archivo)`` en paralelo y entrega los resultados en orden de entrada.
+
+    El parseo es CPU puro e independiente por archivo, por eso se reparte entre todos los núcleos.
+    En lotes chicos se parsea en el mismo proceso leyendo cada archivo en streaming; solo para el
+    pool se materializan los bytes, que son lo que viaja a los procesos hijos.
+    """
+    if len(archivos) < MIN_ARCHIVOS_PARSEO_PARALELO:
+        yield from map(parsear_dte_xml_worker, archivos)
+        return
+
+    payloads = [(_leer_bytes(archivo), nombre) for archivo, nombre in archivos]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        yield from executor.map(parsear_dte_xml_worker, payloads, chunksize=8)